@@ -0,0 +1,51 @@
+"""
+Disk-backed cache of planner LLM responses, so re-running the same goal
+during development replays answers instead of calling the model again.
+
+Uses `diskcache` when installed; otherwise every lookup misses.
+Set MIA_NO_CACHE=1 to bypass it for a fresh run.
+"""
+from __future__ import annotations
+import os
+import hashlib
+from typing import Any, Optional
+
+CACHE_DIR = os.getenv("MIA_LLM_CACHE_DIR", ".mia_llm_cache")
+TTL = 24 * 60 * 60  # seconds
+
+_cache = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        try:
+            import diskcache
+        except ImportError:
+            return None
+        _cache = diskcache.Cache(CACHE_DIR)
+    return _cache
+
+
+def enabled() -> bool:
+    return os.getenv("MIA_NO_CACHE", "0") != "1"
+
+
+def canonical(prompt: str) -> str:
+    """Normalize whitespace drift that should not change the cache key."""
+    return "\n".join(line.rstrip() for line in prompt.splitlines())
+
+
+def key_for(prompt: str) -> str:
+    return hashlib.blake2b(canonical(prompt).encode(), digest_size=16).hexdigest()
+
+
+def get(key: str) -> Optional[Any]:
+    cache = _get_cache() if enabled() else None
+    return cache.get(key) if cache is not None else None
+
+
+def set(key: str, value: Any, expire: int = TTL) -> None:
+    cache = _get_cache() if enabled() else None
+    if cache is not None:
+        cache.set(key, value, expire=expire)
@@ -2,12 +2,20 @@ import asyncio, os
 import typer
 from rich import print
 from dotenv import load_dotenv
-from ai_adapter.core.router import Router
+from ai_adapter.core.router import get_router
 from ai_adapter.core.executor import Executor
 from ai_adapter.core.memory import Memory
 from ai_adapter.nlp.engines import make_engine
 from ai_adapter.nlp.parser import SYSTEM_PROMPT
 
+INTENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents")
+
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 
 app = typer.Typer()
 
@@ -17,8 +25,7 @@ def chat():
     """Interactive chat → build & execute commands"""
     load_dotenv()
     engine = make_engine()
-    intents_dir = os.path.join(os.path.dirname(__file__), 'intents')
-    router = Router(intents_dir)
+    router = get_router(INTENTS_DIR)
     execu = Executor(confirm=os.getenv('CONFIRMATION','ask')=='ask')
     mem = Memory()
 
@@ -34,7 +41,7 @@ def chat():
                 params = data.get('params', {})
                 spec = router.get(intent)
                 cmds = execu.build(spec, params)
-                code = execu.run(cmds)
+                code = await execu.run_async(cmds, spec.get("parallel", False))
                 print(f"[green]Done. Exit code: {code}[/green]")
             except KeyboardInterrupt:
                 break
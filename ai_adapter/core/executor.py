@@ -1,17 +1,86 @@
 from __future__ import annotations
-import subprocess
+import asyncio
 import importlib
+import functools
+import os
+import re
+import shlex
+import shutil
 from typing import Dict, Any, List, Union
-from jinja2 import Template
+from jinja2 import Environment, Template
 from rich import print
 
 
+_env = Environment(autoescape=False)
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(tpl: str) -> Template:
+    """Compile a command template once and reuse it across requests."""
+    return _env.from_string(tpl)
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve_plugin(path: str):
+    """Resolve "module.func" to the plugin callable once."""
+    mod_name, fn = path.split(".")
+    return getattr(importlib.import_module(f"ai_adapter.plugins.{mod_name}"), fn)
+
+
+# Commands using pipes, redirects, chaining, globs, comments or expansions
+# still need /bin/sh
+_SHELL_SYNTAX = re.compile(r"[|&;<>$`*?(){}\[\]#!]")
+_SHELL_BUILTINS = frozenset({
+    ".", "alias", "bg", "cd", "command", "eval", "exec", "exit", "export",
+    "fg", "jobs", "read", "readonly", "set", "shift", "source", "trap",
+    "type", "ulimit", "umask", "unalias", "unset", "wait",
+})
+_ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*=")
+_QUOTING = re.compile(r"['\"\\]")
+
+
+def _needs_shell(args: List[str]) -> bool:
+    """Builtins, NAME=value prefixes and anything not on PATH go to the shell."""
+    head = args[0]
+    return (
+        head in _SHELL_BUILTINS
+        or _ASSIGNMENT.match(head) is not None
+        or shutil.which(os.path.expanduser(head)) is None
+    )
+
+
+async def _prompt(message: str) -> str:
+    """Read a confirmation off the loop thread; the GUI shares one loop."""
+    return await asyncio.to_thread(input, message)
+
+
+async def _spawn(cmd: str) -> int:
+    """Run one command, exec'ing it directly unless it needs a shell."""
+    try:
+        args = None if _SHELL_SYNTAX.search(cmd) else shlex.split(cmd)
+    except ValueError:
+        args = None
+    # shlex drops quotes, so a quoted "~" would look expandable; let sh decide
+    if not args or _needs_shell(args) or ("~" in cmd and _QUOTING.search(cmd)):
+        proc = await asyncio.create_subprocess_shell(cmd)
+    else:
+        # Only unquoted words remain here, so this matches sh's ~ expansion
+        args = [os.path.expanduser(a) for a in args]
+        try:
+            proc = await asyncio.create_subprocess_exec(*args)
+        except FileNotFoundError:
+            print(f"[red]Command not found:[/red] {args[0]}")
+            return 127
+    return await proc.wait()
+
+
 class Executor:
     def __init__(self, confirm: bool = True):
         self.confirm = confirm
+        self._confirm = self._confirm_ask if confirm else self._confirm_noask
 
     def _render(self, template: str, params: Dict[str, Any]) -> str:
-        return Template(template).render(**(params or {}))
+        return _compile(template).render(**(params or {}))
 
     def build(self, spec: Dict[str, Any], params: Dict[str, Any]) -> List[Union[str, dict]]:
         """
@@ -27,38 +96,46 @@ class Executor:
                     "sudo apt-get update",
                     "sudo apt-get install -y google-chrome-stable",
                 ]
-            return [self._render(cmd, params) for cmd in spec["shell"]]
+            return [
+                cmd.render(**(params or {})) if isinstance(cmd, Template) else self._render(cmd, params)
+                for cmd in spec["shell"]
+            ]
         elif "plugin" in spec:
             return [{"plugin": spec["plugin"], "params": params}]
         raise ValueError("Spec missing shell list or plugin entry")
 
-    def run(self, commands: List[Union[str, dict]]) -> int:
+    def run(self, commands: List[Union[str, dict]], parallel: bool = False) -> int:
+        """
+        Synchronous wrapper around run_async() for callers without a loop.
+        """
+        return asyncio.run(self.run_async(commands, parallel))
+
+    async def run_async(self, commands: List[Union[str, dict]], parallel: bool = False) -> int:
         """
         Executes shell commands or Python plugin functions.
+        Independent shell commands (intent declares `parallel: true`) run concurrently.
         """
+        if parallel and all(isinstance(cmd, str) for cmd in commands):
+            return await self._run_parallel(commands)
+
         code = 0
         for cmd in commands:
             if isinstance(cmd, str):
                 # --- Shell command ---
-                print(f"\n[bold]Will execute:[/bold] [cyan]{cmd}[/cyan]")
-                if self.confirm:
-                    ok = input("Execute? [y/N] ").strip().lower().startswith("y")
-                    if not ok:
-                        print("[yellow]Skipped.[/yellow]")
-                        continue
-                p = subprocess.run(cmd, shell=True)
-                code = p.returncode
+                if not await self._confirm(cmd):
+                    continue
+                code = await _spawn(cmd)
 
             elif isinstance(cmd, dict) and "plugin" in cmd:
                 # --- Plugin call ---
                 plugin_path = cmd["plugin"]
                 params = cmd.get("params", {})
                 try:
-                    module_name, func_name = plugin_path.split(".")
-                    mod = importlib.import_module(f"ai_adapter.plugins.{module_name}")
-                    func = getattr(mod, func_name)
+                    func = _resolve_plugin(plugin_path)
                     print(f"\n[magenta]→ Plugin call:[/magenta] {plugin_path} {params}")
-                    code = func(**params)
+                    # Plugins are sync and may drive their own event loop (planner_wrapper)
+                    loop = asyncio.get_running_loop()
+                    code = await loop.run_in_executor(None, functools.partial(func, **params))
                 except Exception as e:
                     print(f"[red]❌ Plugin error:[/red] {e}")
                     code = 1
@@ -68,3 +145,21 @@ class Executor:
 
         return code
 
+    async def _confirm_ask(self, cmd: str) -> bool:
+        """Show the command and ask; False means the user skipped it."""
+        print(f"\n[bold]Will execute:[/bold] [cyan]{cmd}[/cyan]")
+        ok = (await _prompt("Execute? [y/N] ")).strip().lower().startswith("y")
+        if not ok:
+            print("[yellow]Skipped.[/yellow]")
+        return ok
+
+    async def _confirm_noask(self, cmd: str) -> bool:
+        print(f"\n[bold]Will execute:[/bold] [cyan]{cmd}[/cyan]")
+        return True
+
+    async def _run_parallel(self, commands: List[str]) -> int:
+        # Ask for every command up front, then run the approved ones together
+        approved = [cmd for cmd in commands if await self._confirm(cmd)]
+        codes = await asyncio.gather(*(_spawn(cmd) for cmd in approved))
+        return max(codes, default=0)
+
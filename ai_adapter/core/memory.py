@@ -1,40 +1,72 @@
 from collections import deque
+from itertools import islice
+import functools
 import os
 
+
+@functools.lru_cache(maxsize=256)
+def _expand(p: str) -> str:
+    return os.path.expanduser(p)
+
+
 class Memory:
     """Rolling conversational memory with symbolic context (paths, vars)."""
     def __init__(self, maxlen: int = 20):
         self.buf = deque(maxlen=maxlen)
         self.state = {}
+        # Last lines of the conversation, for prompts that only need a tail
+        self.recent_lines = deque(maxlen=64)
+        # Cached renderings, rebuilt only when buf/state change
+        self._joined = ""
+        self._summary = None
+        self._prompt = None
 
     # -------------------------------
     # Conversation memory
     # -------------------------------
     def add(self, text: str):
         """Add a user or assistant message to the rolling chat context."""
+        rolled = len(self.buf) == self.buf.maxlen
         self.buf.append(text)
+        self.recent_lines.extend(text.splitlines())
+        if rolled:
+            # Oldest message was dropped; rebuild from the deque
+            self._joined = "\n".join(self.buf)
+        elif len(self.buf) == 1:
+            self._joined = text
+        else:
+            self._joined += "\n" + text
+        self._prompt = None
 
     def context(self) -> str:
         """Return recent conversation history for the LLM."""
-        if not self.buf:
-            return ""
-        return "\n".join(self.buf)
+        return self._joined
+
+    def recent(self, n: int) -> str:
+        """Return the last `n` lines of the conversation (up to 64)."""
+        start = max(0, len(self.recent_lines) - n)
+        return "\n".join(islice(self.recent_lines, start, None))
 
     # -------------------------------
     # Symbolic context (folders/files)
     # -------------------------------
     def set(self, key: str, value: str):
-        self.state[key] = os.path.expanduser(value)
+        self.state[key] = _expand(value)
+        self._summary = None
+        self._prompt = None
 
     def get(self, key: str, default=None):
         return self.state.get(key, default)
 
     def summary(self) -> str:
         """Compact text summary for inclusion in prompts."""
-        if not self.state:
-            return ""
-        lines = [f"- {k}: {v}" for k, v in self.state.items()]
-        return "Context:\n" + "\n".join(lines)
+        if self._summary is None:
+            if not self.state:
+                self._summary = ""
+            else:
+                lines = [f"- {k}: {v}" for k, v in self.state.items()]
+                self._summary = "Context:\n" + "\n".join(lines)
+        return self._summary
 
     # -------------------------------
     # Combined prompt context
@@ -44,10 +76,12 @@ class Memory:
         Combine structured context (last file/folder)
         with last conversation messages.
         """
-        ctx = []
-        if self.state:
-            ctx.append(self.summary())
-        if self.buf:
-            ctx.append("\nRecent conversation:\n" + self.context())
-        return "\n".join(ctx).strip()
+        if self._prompt is None:
+            ctx = []
+            if self.state:
+                ctx.append(self.summary())
+            if self.buf:
+                ctx.append("\nRecent conversation:\n" + self.context())
+            self._prompt = "\n".join(ctx).strip()
+        return self._prompt
 
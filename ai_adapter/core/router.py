@@ -1,17 +1,80 @@
 from __future__ import annotations
-import yaml, os
+import yaml, os, glob, functools
 from typing import Dict, Any
+from jinja2 import Template, TemplateSyntaxError
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+try:
+    import orjson as _json
+    _dumps = _json.dumps
+except ImportError:
+    import json as _json
+    def _dumps(obj) -> bytes:
+        return _json.dumps(obj).encode('utf-8')
+
+
+CACHE_FILE = '.intents.cache.json'
 
 
 class Router:
     def __init__(self, intents_dir: str):
-        self.templates: Dict[str, Dict[str, Any]] = {}
-        for fn in sorted(os.listdir(intents_dir)):
-            if fn.endswith('.yaml'):
-                with open(os.path.join(intents_dir, fn), 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f) or {}
-                    self.templates.update(data)
+        self.templates: Dict[str, Dict[str, Any]] = self._load(intents_dir)
+        # Shell commands are static, so compile them once here and let the
+        # executor only render them per request.
+        for spec in self.templates.values():
+            if isinstance(spec, dict) and "shell" in spec:
+                spec["shell"] = [self._compile(s) for s in spec["shell"]]
+
+    @staticmethod
+    def _compile(cmd: str):
+        # Leave invalid templates as strings so they only fail if used
+        try:
+            return Template(cmd)
+        except TemplateSyntaxError:
+            return cmd
+
+    @staticmethod
+    def _load(intents_dir: str) -> Dict[str, Dict[str, Any]]:
+        templates: Dict[str, Dict[str, Any]] = {}
+        cache_path = os.path.join(intents_dir, CACHE_FILE)
+        mtimes = {
+            os.path.basename(path): os.path.getmtime(path)
+            for path in sorted(glob.glob(os.path.join(intents_dir, '*.yaml')))
+        }
+
+        # Fast path: reuse the JSON cache when no YAML file changed
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = _json.loads(f.read())
+            if cached.get('mtimes') == mtimes:
+                return cached['templates']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+        for fn in mtimes:
+            with open(os.path.join(intents_dir, fn), 'r', encoding='utf-8') as f:
+                data = yaml.load(f, Loader=_Loader) or {}
+                templates.update(data)
+
+        # Cache is best-effort: a read-only install just keeps parsing YAML
+        try:
+            with open(cache_path, 'wb') as f:
+                f.write(_dumps({"mtimes": mtimes, "templates": templates}))
+        except (OSError, TypeError, ValueError):
+            pass
+        return templates
+
     def get(self, intent: str) -> Dict[str, Any]:
         if intent not in self.templates:
             raise KeyError(f"Unknown intent: {intent}")
-        return self.templates[intent]
\ No newline at end of file
+        return self.templates[intent]
+
+
+@functools.lru_cache(maxsize=1)
+def get_router(intents_dir: str) -> Router:
+    """Return a shared Router; intents are read-only once loaded."""
+    return Router(intents_dir)
@@ -1,4 +1,8 @@
+import functools
 import os
 
+@functools.lru_cache(maxsize=None)
 def feature_enabled(name: str, default=True) -> bool:
-    return os.getenv(name, "1" if default else "0") == "1"
\ No newline at end of file
+    """Read a 0/1 feature flag; the value is snapshotted on first lookup,
+    so environment changes after startup are ignored."""
+    return os.environ.get(name, "1" if default else "0") == "1"
@@ -1,13 +1,22 @@
-import asyncio, os, threading
+import asyncio, collections, os, threading
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk
 from dotenv import load_dotenv
-from ai_adapter.core.router import Router
+from ai_adapter.core.router import get_router
 from ai_adapter.core.executor import Executor
 from ai_adapter.nlp.engines import make_engine
-from ai_adapter.nlp.parser import SYSTEM_PROMPT
+from ai_adapter.nlp.parser import AGENT_PROMPT
 from ai_adapter.core.memory import Memory
 
+INTENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents")
+
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -36,9 +45,34 @@ class App(tk.Tk):
         # --- Load environment and engines ---
         load_dotenv()
         self.engine = make_engine()
-        intents_dir = os.path.join(os.path.dirname(__file__), "intents")
-        self.router = Router(intents_dir)
+        # Parse intents off the UI thread; _handle waits on first use
+        pool = ThreadPoolExecutor(max_workers=1)
+        self._router_future = pool.submit(get_router, INTENTS_DIR)
+        pool.shutdown(wait=False)
         self.execu = Executor(confirm=os.getenv("CONFIRMATION", "ask") == "ask")
+        # MIA_GUI_MODE=oneshot runs a single intent per message (no agent loop)
+        self.oneshot = os.getenv("MIA_GUI_MODE", "loop") == "oneshot"
+
+        # --- One persistent event loop for all engine calls ---
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+
+    @property
+    def router(self):
+        return self._router_future.result()
+
+    def destroy(self):
+        try:
+            asyncio.run_coroutine_threadsafe(self.engine.aclose(), self._loop).result(timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        super().destroy()
+
+    # --- Streaming progress from the engine ---
+    def _progress(self, token: str):
+        self._partial += token
+        self.status.config(text=f"Thinking… {self._partial[-80:]}")
 
     # --- Utility logging ---
     def log(self, s: str):
@@ -62,13 +96,12 @@ class App(tk.Tk):
     # --- Background handler for processing commands ---
     def _handle(self, text: str):
         self.status.config(text="Processing…")
-        MAX_STEPS = 5
+        MAX_STEPS = 1 if self.oneshot else 5
         seen_actions: dict = {}
+        code_counts = collections.Counter()
         stop = False
         followup_note = ""
         step = 0
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
         try:
             self.memory.add(f"User: {text}")
             while not stop and step < MAX_STEPS:
@@ -79,66 +112,94 @@ class App(tk.Tk):
                 if followup_note:
                     user_prompt = f"{user_prompt}\n\nSystem: {followup_note}"
 
-                data = loop.run_until_complete(self.engine.parse(user_prompt, SYSTEM_PROMPT))
+                self._partial = ""
+                fut = asyncio.run_coroutine_threadsafe(
+                    self.engine.parse(user_prompt, AGENT_PROMPT, on_token=self._progress), self._loop
+                )
+                data = fut.result()
+                self.status.config(text="Processing…")
 
                 # --- Parse result from LLM ---
                 if not isinstance(data, dict):
                     self.log(f"Error: Invalid response from engine → {data}")
                     break
 
-                intent = data.get("intent")
-                params = data.get("params", {}) or {}
+                actions = data.get("actions")
+                batched = isinstance(actions, list) and bool(actions)
                 stop = data.get("stop", False)
 
                 # --- Store in short-term memory ---
                 self.memory.add(f"MIA: {data}")
 
-                if stop:
+                # A single-intent reply with stop=true ends the loop before running
+                if stop and not batched:
                     self.log(data.get("report") or "Done.")
                     break
 
-                if not intent:
-                    self.log("Error: Missing intent from engine response.")
-                    break
+                if not batched:
+                    if not data.get("intent"):
+                        self.log("Error: Missing intent from engine response.")
+                        break
+                    actions = [{"intent": data.get("intent"), "params": data.get("params")}]
 
-                # --- Update symbolic context for future prompts ---
-                if intent == "create_folder" and "path" in params:
-                    self.memory.set("last_folder", params["path"])
-                elif intent in ("create_file", "write_file", "edit_file") and "path" in params:
-                    self.memory.set("last_file", params["path"])
+                halted = False
+                ran = []
+                for action in actions:
+                    intent = action.get("intent") if isinstance(action, dict) else None
+                    params = (action.get("params") if isinstance(action, dict) else None) or {}
+                    if not intent:
+                        self.log("Error: Missing intent from engine response.")
+                        halted = True
+                        break
 
-                key = (intent, tuple(sorted(params.items())))
-                if key in seen_actions and seen_actions[key] == 0:
-                    self.log("[GUARD] Repeated successful action detected, stopping before re-running.")
-                    break
+                    # --- Update symbolic context for future prompts ---
+                    if intent == "create_folder" and "path" in params:
+                        self.memory.set("last_folder", params["path"])
+                    elif intent in ("create_file", "write_file", "edit_file") and "path" in params:
+                        self.memory.set("last_file", params["path"])
+
+                    key = (intent, tuple(sorted(params.items())))
+                    if key in seen_actions and seen_actions[key] == 0:
+                        self.log("[GUARD] Repeated successful action detected, stopping before re-running.")
+                        halted = True
+                        break
 
-                # --- Execute the resulting intent ---
-                spec = self.router.get(intent)
-                cmds = self.execu.build(spec, params)
-                for c in cmds:
-                    self.log(f"→ {c}")
+                    # --- Execute the resulting intent ---
+                    spec = self.router.get(intent)
+                    cmds = self.execu.build(spec, params)
+                    for c in cmds:
+                        self.log(f"→ {c}")
 
-                code = self.execu.run(cmds)
-                self.log(f"✔ Exit code: {code}")
-                self.memory.add(f"MIA: ran {intent} params={params} -> code={code}")
+                    code = asyncio.run_coroutine_threadsafe(self.execu.run_async(cmds, spec.get("parallel", False)), self._loop).result()
+                    self.log(f"✔ Exit code: {code}")
+                    self.memory.add(f"MIA: ran {intent} params={params} -> code={code}")
+                    ran.append(f"{intent} with params {params}, exit code {code}")
 
-                seen_actions[key] = code
-                if code != 0 and list(seen_actions.values()).count(code) > 1:
-                    self.log("[GUARD] Repeated failing action detected, stopping loop.")
+                    if key in seen_actions:
+                        code_counts[seen_actions[key]] -= 1
+                    seen_actions[key] = code
+                    code_counts[code] += 1
+                    if code != 0 and code_counts[code] > 1:
+                        self.log("[GUARD] Repeated failing action detected, stopping loop.")
+                        halted = True
+                        break
+
+                if halted:
+                    break
+
+                # A batch marked stop=true is complete once all its actions ran
+                if stop:
+                    self.log(data.get("report") or "Done.")
                     break
 
-                followup_note = f"Last action: {intent} with params {params}, exit code {code}. Continue until the goal is satisfied or set stop=true."
+                followup_note = f"Last action: {'; '.join(ran)}. Continue until the goal is satisfied or set stop=true."
 
-            if step >= MAX_STEPS:
+            if step >= MAX_STEPS and not self.oneshot:
                 self.log("Reached max steps without stop signal.")
 
         except Exception as e:
             self.log(f"Error: {e}")
         finally:
-            try:
-                loop.run_until_complete(loop.shutdown_asyncgens())
-            finally:
-                loop.close()
             self.status.config(text="Ready")
 
 
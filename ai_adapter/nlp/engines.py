@@ -1,8 +1,11 @@
 from __future__ import annotations
 import os
-import json
+try:
+    import orjson as _json  # faster drop-in for loads()
+except ImportError:
+    import json as _json
 import httpx
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env"))
@@ -11,67 +14,106 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.dir
 # Base engine
 # ------------------------------------------------------------
 
+# Optional callback receiving partial response text as it streams in
+TokenCallback = Optional[Callable[[str], None]]
+
 class Engine:
-    async def parse(self, prompt: str, system: str) -> Dict[str, Any]:
+    temperature: Optional[float] = None  # None → provider default
+
+    async def parse(self, prompt: str, system: str, on_token: TokenCallback = None) -> Dict[str, Any]:
         raise NotImplementedError("No backend AI engine selected or misconfigured.")
 
+    async def aclose(self) -> None:
+        """Release any network resources held by the engine."""
+        pass
+
 # ------------------------------------------------------------
 # OpenAI backend
 # ------------------------------------------------------------
 
 class OpenAIEngine(Engine):
-    def __init__(self, model: str, api_key: str):
+    def __init__(self, model: str, api_key: str, temperature: Optional[float] = None):
+        from openai import AsyncOpenAI
         self.api_key = api_key
         self.model = model
+        self.temperature = temperature
+        self.client = AsyncOpenAI(api_key=api_key)  # shared so connections are reused
 
-    async def parse(self, prompt: str, system: str) -> Dict[str, Any]:
-        from openai import AsyncOpenAI
-        client = AsyncOpenAI(api_key=self.api_key)  # create new client each time
-
+    async def parse(self, prompt: str, system: str, on_token: TokenCallback = None) -> Dict[str, Any]:
         messages = [
             {"role": "system", "content": system},
             {"role": "user", "content": prompt}
         ]
+        extra = {} if self.temperature is None else {"temperature": self.temperature}
         try:
-            response = await client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
+                **extra,
             )
             content = response.choices[0].message.content.strip()
-            return json.loads(content)
+            return _json.loads(content)
         except Exception as e:
             print(f"[OpenAIEngine] Connection error: {e}")
             raise
 
+    async def aclose(self) -> None:
+        await self.client.close()
+
 
 # ------------------------------------------------------------
 # Ollama backend (local)
 # ------------------------------------------------------------
 
 class OllamaEngine(Engine):
-    def __init__(self, model: str):
+    def __init__(self, model: str, temperature: Optional[float] = None):
         self.model = model
-        self.url = "http://127.0.0.1:11434/api/chat"
-
-    async def parse(self, prompt: str, system: str) -> Dict[str, Any]:
+        self.temperature = temperature
+        self.url = "/api/chat"
+        # One long-lived client keeps the keep-alive pool across requests
+        self.client = httpx.AsyncClient(
+            base_url="http://127.0.0.1:11434",
+            timeout=120,
+            limits=httpx.Limits(max_keepalive_connections=16),
+        )
+
+    async def parse(self, prompt: str, system: str, on_token: TokenCallback = None) -> Dict[str, Any]:
         payload = {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": prompt}
             ],
-            "format": "json"
+            "format": "json",
+            "stream": True,
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.url, json=payload, timeout=120)
+        if self.temperature is not None:
+            payload["options"] = {"temperature": self.temperature}
+        # Stream NDJSON chunks so callers can show progress while the model writes
+        parts = []
+        async with self.client.stream("POST", self.url, json=payload) as response:
             response.raise_for_status()
-            data = response.json()
-            if isinstance(data, dict) and "message" in data:
-                try:
-                    return json.loads(data["message"]["content"])
-                except Exception:
-                    return {"intent": "unknown", "params": {"raw": data}}
-            return data
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = _json.loads(line)
+                if not isinstance(chunk, dict) or "error" in chunk:
+                    return chunk
+                token = (chunk.get("message") or {}).get("content", "")
+                if token:
+                    parts.append(token)
+                    if on_token:
+                        on_token(token)
+                if chunk.get("done"):
+                    break
+        content = "".join(parts)
+        try:
+            return _json.loads(content)
+        except Exception:
+            return {"intent": "unknown", "params": {"raw": content}}
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
 
 # ------------------------------------------------------------
 # Factory selector
@@ -82,14 +124,16 @@ def make_engine() -> Engine:
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
     ollama_model = os.getenv("OLLAMA_MODEL", "llama3")
     openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    temp = os.getenv("LLM_TEMPERATURE", "").strip()
+    temperature = float(temp) if temp else None
 
     if eng == "openai" or (eng == "auto" and api_key):
         print("[AI Adapter] ✅ Using OpenAI backend")
-        return OpenAIEngine(model=openai_model, api_key=api_key)
+        return OpenAIEngine(model=openai_model, api_key=api_key, temperature=temperature)
 
     elif eng == "ollama" or (eng == "auto" and not api_key):
         print("[AI Adapter] ✅ Using Ollama backend")
-        return OllamaEngine(model=ollama_model)
+        return OllamaEngine(model=ollama_model, temperature=temperature)
 
     raise RuntimeError(
         "❌ No AI backend configured. Set ENGINE=openai and OPENAI_API_KEY in .env "
@@ -19,3 +19,9 @@ SYSTEM_PROMPT = (
     "- Example 5: {\"intent\": \"file_exists\", \"params\": {\"path\": \"~/demo/main.py\"}}\n"
 )
 
+# Used by the GUI agent loop, which can execute several actions per reply.
+AGENT_PROMPT = SYSTEM_PROMPT + (
+    "- If the request needs several steps you can already decide, you may instead respond with\n"
+    "{ \"actions\": [ { \"intent\": \"intent_name\", \"params\": { ... } }, ... ], \"stop\": true, \"report\": \"...\" }\n"
+    "  Set \"stop\": false only if you must see the result of the last action before deciding what to do next.\n"
+)
@@ -1,24 +1,28 @@
 from __future__ import annotations
 
-import sys
-if __name__ == "__main__" and "ai_adapter.planner.self_loop" in sys.modules:
-    del sys.modules["ai_adapter.planner.self_loop"]
-
 import os
 import io
 import json
 import asyncio
+import atexit
 import contextlib
-import subprocess
+import copy
+import functools
+import hashlib
+import re
 import shlex
+import time
 import traceback
-from typing import Dict, Any, List, Optional, Tuple
+from collections import Counter, OrderedDict, deque
+from typing import ClassVar, Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 
-from ai_adapter.core.router import Router
-from ai_adapter.core.executor import Executor
+from jinja2 import Template
+from ai_adapter.core.router import Router, get_router
+from ai_adapter.core.executor import Executor, _compile, _resolve_plugin
 from ai_adapter.core.memory import Memory
-from ai_adapter.nlp.engines import make_engine
+from ai_adapter.cache import llm_disk
+from ai_adapter.nlp.engines import Engine, make_engine
 from ai_adapter.nlp.parser import SYSTEM_PROMPT
 
 
@@ -32,23 +36,46 @@ SAFE_INTENTS_DEFAULT = {
 
 MAX_STEPS_DEFAULT = 20
 
-def _needs_create(goal: str) -> bool:
-    g = goal.lower()
-    return any(w in g for w in (
-        "create", "make", "write a file", "write file",
-        "put a file", "add a file", "new folder", "new directory", "create folder"
-    ))
+# Same path the CLI uses, so both share one get_router() instance
+INTENTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "intents"))
+
+# Environment read by make_engine(); a change here means a new engine
+ENGINE_ENV_VARS = ("ENGINE", "OPENAI_API_KEY", "OPENAI_MODEL", "OLLAMA_MODEL", "LLM_TEMPERATURE")
+
+# An identical (intent, params) action may run this many times within the
+# last REPEAT_WINDOW executed actions before it is suppressed
+REPEAT_LIMIT = 2
+REPEAT_WINDOW = 6
+
+# Longest command output kept per item (the planner only shows ~2000 chars)
+OBS_MAX_CHARS = 4000
+
+# Planner LLM response cache (only used when the engine runs at temperature 0)
+RESP_CACHE_SIZE = 256
+RESP_CACHE_TTL = 600  # seconds
 
-def _needs_edit(goal: str) -> bool:
-    g = goal.lower()
-    return any(w in g for w in ("edit", "modify", "change", "convert", "update", "refactor"))
+MUTATION_INTENTS = frozenset({"create_file", "write_file", "edit_file", "create_folder"})
+EDIT_INTENTS = frozenset({"edit_file", "write_file"})
 
-def _mentioned_path(goal: str) -> bool:
-    # very light heuristic: goal mentions a path-ish token like ~/ or .py
-    g = goal.lower()
-    return ("~/" in g) or ("/home/" in g) or (".py" in g)
+_CREATE_WORDS = re.compile("|".join(map(re.escape, (
+    "create", "make", "write a file", "write file",
+    "put a file", "add a file", "new folder", "new directory", "create folder"
+))))
+_EDIT_WORDS = re.compile("|".join(map(re.escape, (
+    "edit", "modify", "change", "convert", "update", "refactor"
+))))
 
-PLANNER_PROMPT = """
+# The *_lc helpers take the goal already lower-cased (once per run).
+def _needs_create_lc(g: str) -> bool:
+    return _CREATE_WORDS.search(g) is not None
+
+def _needs_edit_lc(g: str) -> bool:
+    return _EDIT_WORDS.search(g) is not None
+
+# The planner prompt is split so every step shares a byte-identical prefix
+# (rules, allowed intents, goal) and only the tail changes; this lets the
+# provider's prompt-prefix cache serve steps 2..N.
+PLANNER_PROMPT_STATIC = """
 You are MIA's autonomous planner. You have to achieve the user's GOAL by deciding ONE next action
 (intents are predefined). Think step-by-step but OUTPUT ONLY JSON with this schema:
 
@@ -75,6 +102,11 @@ Do not mark stop=true until all required actions have been executed.
 ALLOWED_INTENTS:
 {allowed}
 
+GOAL:
+{goal}
+"""
+
+PLANNER_PROMPT_DYNAMIC = """
 CONTEXT (symbolic):
 {symbolic}
 
@@ -83,9 +115,6 @@ RECENT MESSAGES:
 
 LAST OBSERVATION:
 {observation}
-
-GOAL:
-{goal}
 """
 
 # -------------------------------------
@@ -99,18 +128,12 @@ class Observation:
     output: str = ""
     error: str = ""
 
-def _expand(path: str) -> str:
-    return os.path.abspath(os.path.expanduser(path))
-
 def _capture_plugin_call(plugin_path: str, params: Dict[str, Any]) -> Observation:
     """
     Dynamically import and call a plugin, capturing printed output.
     Plugins typically return int exit codes; we capture prints to show the planner.
     """
-    import importlib
-    mod_name, func_name = plugin_path.split(".")
-    mod = importlib.import_module(f"ai_adapter.plugins.{mod_name}")
-    fn = getattr(mod, func_name)
+    fn = _resolve_plugin(plugin_path)  # memoized, shared with Executor
     buf = io.StringIO()
     code = 0
     with contextlib.redirect_stdout(buf):
@@ -121,23 +144,40 @@ def _capture_plugin_call(plugin_path: str, params: Dict[str, Any]) -> Observatio
             return Observation(code=1, output=buf.getvalue(), error=f"{e}\n{tb}")
     return Observation(code=code, output=buf.getvalue(), error="")
 
-def _capture_shell(cmd: str) -> Observation:
+@functools.lru_cache(maxsize=512)
+def _split(cmd: str) -> Tuple[str, ...]:
+    return tuple(os.path.expanduser(arg) for arg in shlex.split(cmd))
+
+async def _capture_shell_async(cmd: str) -> Observation:
     """
     Run a shell command and capture stdout/stderr safely.
     Expands ~ to the home folder to keep paths consistent.
     """
     try:
-        cmd = os.path.expanduser(cmd)
-        proc = subprocess.run(
-            shlex.split(cmd),
-            check=False,
-            capture_output=True,
-            text=True,
+        proc = await asyncio.create_subprocess_exec(
+            *_split(cmd),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        out, err = await proc.communicate()
+        return Observation(
+            code=proc.returncode,
+            output=out.decode(errors="replace"),
+            error=err.decode(errors="replace"),
         )
-        return Observation(code=proc.returncode, output=proc.stdout, error=proc.stderr)
     except Exception as e:
         return Observation(code=1, output="", error=str(e))
 
+async def _observe_one(item: Any) -> Observation:
+    if isinstance(item, str):
+        return await _capture_shell_async(item)
+    if isinstance(item, dict) and "plugin" in item:
+        # Plugins are sync and may run their own event loop (planner_wrapper),
+        # so call them off the loop thread.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _capture_plugin_call, item["plugin"], item.get("params", {}))
+    return Observation(code=1, output="", error=f"Unknown command type: {item!r}")
+
 def _build_cmds(router: Router, spec: Dict[str, Any], params: Dict[str, Any]) -> List[Any]:
     """
     Build commands or plugin calls the same way the Executor does, but
@@ -145,48 +185,57 @@ def _build_cmds(router: Router, spec: Dict[str, Any], params: Dict[str, Any]) ->
     """
     items: List[Any] = []
     if "shell" in spec:
-        from jinja2 import Template
         for template in spec["shell"]:
-            items.append(Template(template).render(**(params or {})))
+            if not isinstance(template, Template):
+                template = _compile(template)  # memoized, shared with Executor
+            items.append(template.render(**(params or {})))
     elif "plugin" in spec:
         items.append({"plugin": spec["plugin"], "params": params})
     else:
         raise ValueError("Spec missing shell list or plugin")
     return items
 
-def _execute_and_observe(commands: List[Any]) -> Observation:
+async def _execute_and_observe_async(commands: List[Any], parallel: bool = False) -> Observation:
     """
     Execute a list of shell or plugin actions, capture all output and errors,
     and return a single aggregated Observation.
+    Shell commands of intents marked `parallel: true` run concurrently; plugins
+    always run one at a time since they capture the process-wide stdout.
     """
 
-    out_parts, err_parts = [], []
-    code_final = 0
+    if parallel and all(isinstance(item, str) for item in commands):
+        results = await asyncio.gather(*(_capture_shell_async(item) for item in commands))
+    else:
+        results = [await _observe_one(item) for item in commands]
 
-    for item in commands:
-        # --- Execute shell or plugin call ---
-        if isinstance(item, str):
-            obs = _capture_shell(item)
-        elif isinstance(item, dict) and "plugin" in item:
-            obs = _capture_plugin_call(item["plugin"], item.get("params", {}))
-        else:
-            obs = Observation(code=1, output="", error=f"Unknown command type: {item!r}")
+    out_buf, err_buf = io.StringIO(), io.StringIO()
+    code_final = 0
 
+    for obs in results:
         # --- Always print the result so planner logs show real content ---
+        # rstrip only: leading indentation is meaningful (diffs, listings)
         if obs.output:
-            print(obs.output.strip())  # ✅ makes plugin output visible to planner
-            out_parts.append(obs.output.strip())
+            out = obs.output[:OBS_MAX_CHARS].rstrip()  # slice first: rstrip() copies
+            print(out)  # ✅ makes plugin output visible to planner
+            if out:
+                if out_buf.tell():
+                    out_buf.write("\n")
+                out_buf.write(out)
 
         if obs.error:
-            print(f"[PLUGIN ERROR] {obs.error.strip()}")  # ✅ visible in logs
-            err_parts.append(obs.error.strip())
+            err = obs.error[:OBS_MAX_CHARS].rstrip()
+            print(f"[PLUGIN ERROR] {err}")  # ✅ visible in logs
+            if err:
+                if err_buf.tell():
+                    err_buf.write("\n")
+                err_buf.write(err)
 
         # track final return code
         code_final = obs.code
 
     # --- Combine results into one Observation ---
-    aggregated_output = "\n".join(p for p in out_parts if p)
-    aggregated_error = "\n".join(p for p in err_parts if p)
+    aggregated_output = out_buf.getvalue()
+    aggregated_error = err_buf.getvalue()
 
     return Observation(
         code=code_final,
@@ -199,35 +248,7 @@ def _fmt_symbolic(mem: Memory) -> str:
     return mem.summary() or "(none)"
 
 def _fmt_history(mem: Memory, max_lines: int = 12) -> str:
-    txt = mem.context()
-    if not txt:
-        return "(none)"
-    lines = txt.splitlines()[-max_lines:]
-    return "\n".join(lines)
-
-def safe_async_run(coro):
-    """
-    Run an async coroutine safely across multiple calls,
-    avoiding 'Event loop is closed' or lingering httpx tasks.
-    """
-    import asyncio
-
-    try:
-        return asyncio.run(coro)
-    except RuntimeError as e:
-        if "Event loop is closed" not in str(e):
-            raise
-    except KeyboardInterrupt:
-        raise
-    finally:
-        try:
-            # Create and close a fresh loop to clean up dangling tasks
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(loop.shutdown_asyncgens())
-            loop.close()
-        except Exception:
-            pass
+    return mem.recent(max_lines) or "(none)"
 
 
 
@@ -237,33 +258,100 @@ class Planner:
     max_steps: int = MAX_STEPS_DEFAULT
     confirm: bool = False  # autonomous
 
+    # Shared across planners: prompt hash -> (stored_at, response)
+    _resp_cache: ClassVar["OrderedDict[str, Tuple[float, Dict[str, Any]]]"] = OrderedDict()
+
+    # One event loop per planner, reused across steps so the engine's HTTP
+    # connections stay alive between LLM calls.
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, init=False, repr=False)
+    # Engine reused across run() calls; its HTTP client is bound to _loop
+    _engine: Optional[Engine] = field(default=None, init=False, repr=False)
+    _engine_key: Tuple[str, ...] = field(default=(), init=False, repr=False)
+
+    def __post_init__(self):
+        self._loop = asyncio.new_event_loop()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Shut down the planner's event loop (safe to call more than once)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        atexit.unregister(self.close)
+        try:
+            if self._engine is not None:
+                with contextlib.suppress(Exception):
+                    self._loop.run_until_complete(self._engine.aclose())
+                self._engine = None
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        finally:
+            self._loop.close()
+
+    def _get_engine(self) -> Engine:
+        """Build the engine once per planner, rebuilding it if its env changed."""
+        key = tuple(os.getenv(k, "") for k in ENGINE_ENV_VARS)
+        if self._engine is None or key != self._engine_key:
+            if self._engine is not None:
+                with contextlib.suppress(Exception):
+                    self._loop.run_until_complete(self._engine.aclose())
+            self._engine = make_engine()
+            self._engine_key = key
+        return self._engine
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        cls._resp_cache.clear()
+
+    def _worth_caching(self, data: Any) -> bool:
+        """Only replay replies naming an allowed intent; stops and errors are re-asked."""
+        return (
+            isinstance(data, dict)
+            and data.get("stop") is not True
+            and "error" not in data
+            and data.get("intent") in self.allowed_intents
+        )
+
+    @classmethod
+    def _remember(cls, key: str, data: Dict[str, Any]) -> None:
+        """Store a response as most recently used and trim the LRU to size."""
+        cls._resp_cache[key] = (time.monotonic(), copy.deepcopy(data))
+        cls._resp_cache.move_to_end(key)
+        while len(cls._resp_cache) > RESP_CACHE_SIZE:
+            cls._resp_cache.popitem(last=False)
+
     def run(self, goal: str) -> None:
         """
         Plan → Act → Observe → Repeat until done or max_steps reached.
         Prints a compact log to stdout.
         """
-        router = Router(os.path.join(os.path.dirname(__file__), "..", "intents"))
+        router = get_router(INTENTS_DIR)
         execu = Executor(confirm=self.confirm)
-        engine = make_engine()
+        engine = self._get_engine()
         memory = Memory()
 
-        print(f"\n[PLANNER] Goal: {goal}\n[PLANNER] Allowed intents: {sorted(self.allowed_intents)}")
+        allowed = sorted(self.allowed_intents)
+        goal_lc = goal.lower()
+        need_create = _needs_create_lc(goal_lc)
+        need_edit = _needs_edit_lc(goal_lc)
+        static_prompt = PLANNER_PROMPT_STATIC.format(allowed=", ".join(allowed), goal=goal)
+
+        print(f"\n[PLANNER] Goal: {goal}\n[PLANNER] Allowed intents: {allowed}")
         observation = Observation(output="(start)", error="", code=0)
         seen_actions = []
         last_mutation = None
+        # Sliding window of executed (intent, params) keys, with counts
+        recent_keys: deque = deque()
+        seen: Counter = Counter()
 
         for step in range(1, self.max_steps + 1):
             # Compose planner prompt
-            prompt = PLANNER_PROMPT.format(
-                allowed=", ".join(sorted(self.allowed_intents)),
+            prompt = static_prompt + PLANNER_PROMPT_DYNAMIC.format(
                 symbolic=_fmt_symbolic(memory),
                 history=_fmt_history(memory),
                 observation=(observation.output or observation.error or "(none)")[:2000],
-                goal=goal,
             )
 
             # Ask LLM for next action
-            data = safe_async_run(self._ask(engine, prompt))
+            data = self._loop.run_until_complete(self._ask(engine, prompt))
             if not isinstance(data, dict):
                 print(f"[PLANNER] Invalid planner JSON: {data}")
                 break
@@ -278,13 +366,8 @@ class Planner:
                 stop = True
             # ----------------- GUARD: don't allow premature stop -----------------
             if data.get("stop", False):
-                need_create = _needs_create(goal)
-                need_edit   = _needs_edit(goal)
-
-                MUTATION_INTENTS = {"create_file", "write_file", "edit_file", "create_folder"}
-
                 did_create = any(a in MUTATION_INTENTS for a in seen_actions)
-                did_edit   = any(a in ("edit_file", "write_file") for a in seen_actions)
+                did_edit   = any(a in EDIT_INTENTS for a in seen_actions)
 
                 # If the goal clearly requires an edit/modify step, but none executed yet, keep going
                 if need_edit and not did_edit:
@@ -320,6 +403,17 @@ class Planner:
                     params["path"] = os.path.join(memory.get("last_folder"), p[2:])
                 memory.set("last_file", params["path"])
 
+            # ----------------- GUARD: suppress repeated identical actions -----------------
+            key = (intent, json.dumps(params, sort_keys=True, default=str))
+            if seen[key] >= REPEAT_LIMIT:
+                print(f"[GUARD] Repeated action {intent} suppressed; asking planner to vary its approach.")
+                observation = Observation(
+                    code=1, output="",
+                    error=f"Repeated action {intent} suppressed; try a different approach.",
+                )
+                memory.add(f"ERR: {observation.error}")
+                continue
+
             # Build & execute
             try:
                 spec = router.get(intent)
@@ -332,8 +426,12 @@ class Planner:
             for c in cmds:
                 print(f"   → {c}")
 
-            observation = _execute_and_observe(cmds)
+            observation = self._loop.run_until_complete(_execute_and_observe_async(cmds, spec.get("parallel", False)))
             seen_actions.append(intent)
+            recent_keys.append(key)
+            seen[key] += 1
+            if len(recent_keys) > REPEAT_WINDOW:
+                seen[recent_keys.popleft()] -= 1
             # append observation to rolling memory
             memory.add(f"MIA: ran {intent} params={params} -> code={observation.code}")
             if observation.output:
@@ -341,23 +439,47 @@ class Planner:
             if observation.error:
                 memory.add(f"ERR: {observation.error[:500]}")
 
-            # Simple success heuristic: if user goal mentions a file and it exists
-            if "file" in goal.lower() and memory.get("last_file"):
-                if os.path.exists(_expand(memory.get("last_file"))):
-                    pass  # could set a completion signal here
-
         print("\n[PLANNER] loop finished.\n")
 
     async def _ask(self, engine, planner_prompt: str) -> Dict[str, Any]:
         """
         Ask your LLM with the planner prompt. We re-use your existing SYSTEM_PROMPT
         to force strict JSON, but feed the planner prompt as the 'user' content.
+        Identical prompts are answered from a small LRU cache when the engine is
+        deterministic (temperature 0), e.g. when the planner stalls or retries,
+        and from the on-disk cache across runs (see ai_adapter.cache.llm_disk).
+        The disk copy only serves prompts this process has not cached yet; once
+        an in-memory entry passes RESP_CACHE_TTL the model is asked again.
         """
+        cacheable = getattr(engine, "temperature", None) == 0
+        if cacheable:
+            ident = f"{type(engine).__name__}:{getattr(engine, 'model', '')}\n{planner_prompt}"
+            key = hashlib.blake2b(ident.encode(), digest_size=16).hexdigest()
+            disk_key = llm_disk.key_for(ident)
+            hit = self._resp_cache.get(key)
+            if hit is not None:
+                if time.monotonic() - hit[0] < RESP_CACHE_TTL:
+                    self._resp_cache.move_to_end(key)
+                    return copy.deepcopy(hit[1])
+                del self._resp_cache[key]  # expired: refresh both caches below
+            else:
+                stored = llm_disk.get(disk_key)
+                if self._worth_caching(stored):  # also skips entries from older runs
+                    self._remember(key, stored)
+                    return stored
+
         try:
-            return await engine.parse(planner_prompt, SYSTEM_PROMPT)
+            data = await engine.parse(planner_prompt, SYSTEM_PROMPT)
         except Exception as e:
             return {"stop": True, "report": f"engine error: {e}"}
 
+        # Never cache terminal, failed or unparsed replies (e.g. an Ollama
+        # {"error": ...} chunk or intent "unknown"), so they can't poison later runs
+        if cacheable and self._worth_caching(data):
+            self._remember(key, data)
+            llm_disk.set(disk_key, data)
+        return data
+
 
 # --- CLI entrypoint ---
 def main():
@@ -9,6 +9,13 @@ Each function returns 0 on success, 1 on error.
 """
 
 import os
+import re
+import errno
+import stat
+import shutil
+import difflib
+import textwrap
+from functools import lru_cache
 from typing import Optional
 from rich import print
 
@@ -19,10 +26,71 @@ def _expand(path: str) -> str:
     path = os.path.expanduser(path)       # expands ~
     return os.path.abspath(path)
 
+_INDENT = re.compile(r"([ \t]*)")
+
+
+def _normalize_indent(new_content: str, base_indent: str) -> str:
+    """Re-base new_content on base_indent, keeping its relative nesting."""
+    text = textwrap.dedent(new_content)
+    if not text.endswith("\n"):
+        text += "\n"
+    return textwrap.indent(text, base_indent)
+
+
+@lru_cache(maxsize=256)
+def _compile_markers(start_marker: str, end_marker: str) -> "re.Pattern[str]":
+    return re.compile(re.escape(start_marker) + r"(.*?)" + re.escape(end_marker), re.DOTALL)
+
+@lru_cache(maxsize=256)
+def _compile_keyword(name: str, keyword: str) -> "re.Pattern[str]":
+    """
+    One-pass scan for either the decorators + def/class block named `name`
+    (up to the next top-level item) or a line consisting only of `keyword`.
+    """
+    return re.compile(
+        rf"(?P<block>(?:^[ \t]*@[^\n]*\n)*"  # decorators (one line each)
+        rf"^[ \t]*(?:async[ \t]+)?(?:def|class)[ \t]+{re.escape(name)}\b"
+        r".*?(?=^[ \t]*(?:def|class|@|\Z)))"
+        rf"|(?P<line>^[ \t]*{re.escape(keyword)}[ \t]*$)",
+        re.DOTALL | re.MULTILINE,
+    )
+
+def _sendfile_copy(src_path: str, dst_path: str) -> None:
+    """Copy bytes kernel-side with os.sendfile (no userspace buffers)."""
+    src_fd = os.open(src_path, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            size = os.fstat(src_fd).st_size
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                if not sent:
+                    break
+                offset += sent
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+def _backup(path: str) -> str:
+    """Write path + ".bak" (data and metadata); returns the backup path."""
+    bak = path + ".bak"
+    if hasattr(os, "sendfile"):
+        try:
+            _sendfile_copy(path, bak)
+            shutil.copystat(path, bak)
+            return bak
+        except OSError as e:
+            # e.g. not a regular file, or sendfile unsupported here
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+    shutil.copy2(path, bak)
+    return bak
+
 def _preview_change(path: str, before: str, after: str) -> None:
     """Print a short diff-style preview of what changed."""
     try:
-        import difflib
         diff = difflib.unified_diff(
             before.splitlines(), after.splitlines(),
             fromfile="before", tofile="after", lineterm=""
@@ -94,33 +162,35 @@ def edit_file(
 
     Returns 0 on success, 1 on failure.
     """
-    import shutil, difflib, re
-
     try:
         path = _expand(path)
         if not os.path.exists(path):
             print(f"[red]❌ File not found:[/red] {path}")
             return 1
 
-        with open(path, "r", encoding="utf-8") as f:
-            before = f.read()
-
         # Backup
         try:
-            shutil.copy2(path, path + ".bak")
-            print(f"[dim]🗂️  Backup created:[/dim] {path}.bak")
+            bak = _backup(path)
+            print(f"[dim]🗂️  Backup created:[/dim] {bak}")
         except Exception as e:
             print(f"[yellow]⚠️ Backup failed:[/yellow] {e}")
 
+        # 3️⃣  Default: overwrite entire file (safe fallback); no need to read it
+        if not (start_marker and end_marker) and not keyword:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new_content.rstrip() + "\n")
+            print(f"[green]✅ Overwrote entire file:[/green] {path}")
+            return 0
+
+        with open(path, "r", encoding="utf-8") as f:
+            before = f.read()
+
         edited = before
         replaced = False
 
         # 1️⃣  Marker-based
         if start_marker and end_marker:
-            pattern = re.compile(
-                re.escape(start_marker) + r"(.*?)" + re.escape(end_marker),
-                re.DOTALL,
-            )
+            pattern = _compile_markers(start_marker, end_marker)
             edited, n = pattern.subn(
                 start_marker + "\n" + new_content.rstrip() + "\n" + end_marker,
                 before,
@@ -128,44 +198,35 @@ def edit_file(
             replaced = n > 0
 
         # 2️⃣  Keyword-based (replace full function/class block)
-        elif keyword:
-            block_pattern = (
-                rf"(^[ \t]*@.*\n)*"  # decorators
-                rf"^[ \t]*(async[ \t]+)?(def|class)[ \t]+{re.escape(keyword.strip().split('(')[0])}\b"
-                r".*?(?=^[ \t]*(?:def|class|@|\Z))"
-            )
-            match = re.search(block_pattern, before, flags=re.DOTALL | re.MULTILINE)
+        else:
+            # A block match anywhere wins; standalone lines seen before it are
+            # only used when the file has no such block.
+            match = None
+            line_hits = []
+            for m in _compile_keyword(keyword.strip().split('(')[0], keyword).finditer(before):
+                if m.lastgroup == "block":
+                    match = m
+                    break
+                line_hits.append(m)
             if match:
-                # Detect indentation of the original block
-                first_line = before.splitlines()[match.start(0):match.end(0)][0]
-                indent_match = re.match(r"^([ \t]*)", first_line)
-                base_indent = indent_match.group(1) if indent_match else ""
+                # Detect indentation of the original block (it starts a line)
+                base_indent = _INDENT.match(before, match.start()).group(1)
 
                 # Normalize new content indentation
-                normalized = []
-                for line in new_content.splitlines():
-                    if line.strip():  # non-empty
-                        normalized.append(base_indent + line.lstrip())
-                    else:
-                        normalized.append("")
-                fixed_content = "\n".join(normalized) + "\n"
+                fixed_content = _normalize_indent(new_content, base_indent)
 
                 edited = before[:match.start()] + fixed_content + before[match.end():]
                 replaced = True
-            else:
+            elif line_hits:
                 # safer single-line keyword replace (anchors full line)
-                pattern = rf"^[ \t]*{re.escape(keyword)}[ \t]*$"
-                edited, n = re.subn(pattern, new_content, before, flags=re.MULTILINE)
-                replaced = n > 0
-
-        # 3️⃣  Default: overwrite entire file (safe fallback)
-        else:
-            # Overwrite the entire file with new_content cleanly
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(new_content.rstrip() + "\n")
-            print(f"[green]✅ Overwrote entire file:[/green] {path}")
-            return 0
-
+                parts, pos = [], 0
+                for m in line_hits:
+                    parts.append(before[pos:m.start()])
+                    parts.append(new_content)
+                    pos = m.end()
+                parts.append(before[pos:])
+                edited = "".join(parts)
+                replaced = True
 
         # --- Diff preview ---
         diff = list(
@@ -198,16 +259,29 @@ def edit_file(
         print(f"[red]❌ edit_file error:[/red] {e}")
         return 1
 
-def read_file(path: str):
+READ_MAX_BYTES = 4096
+
+
+def read_file(path: str, max_bytes: Optional[int] = READ_MAX_BYTES):
     """
     Print file contents so the planner can observe them.
+    Only the first `max_bytes` bytes are read; observations are truncated anyway.
+    A missing, empty or non-positive `max_bytes` (the LLM may send null) means the default.
     """
-    import os
     path = os.path.expanduser(path)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        print(content)
+        max_bytes = int(max_bytes) if max_bytes not in (None, "") else READ_MAX_BYTES
+        if max_bytes <= 0:
+            max_bytes = READ_MAX_BYTES
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            data = os.read(fd, max_bytes)
+        finally:
+            os.close(fd)
+        print(data.decode("utf-8", errors="replace"))
+        if size > len(data):
+            print(f"[dim]…truncated ({len(data)} of {size} bytes)…[/dim]")
         return 0
     except Exception as e:
         print(f"Error reading {path}: {e}")
@@ -241,10 +315,15 @@ def list_dir(path: str):
     """
     List contents of a specific directory path.
     """
-    import os, subprocess
     target = os.path.expanduser(path)
     try:
-        print(subprocess.getoutput(f"ls -lah {target}"))
+        with os.scandir(target) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        lines = []
+        for e in entries:
+            st = e.stat(follow_symlinks=False)
+            lines.append(f"{stat.filemode(st.st_mode)} {st.st_size:>10} {e.name}")
+        print("\n".join(lines))
         return 0
     except Exception as e:
         print(f"Error listing {target}: {e}")
@@ -1,12 +1,31 @@
 # ai_adapter/plugins/planner_wrapper.py
+import threading
 from ai_adapter.planner.self_loop import Planner, SAFE_INTENTS_DEFAULT
 
+# One planner reused across calls so its engine and connections stay warm.
+# A call made while it is busy (e.g. nested planning) gets a private one.
+_shared = None
+_shared_lock = threading.Lock()
+
 def run(goal: str, steps: int = 8) -> int:
+    global _shared
+    use_shared = _shared_lock.acquire(blocking=False)
+    planner = None
     try:
-        planner = Planner(allowed_intents=set(SAFE_INTENTS_DEFAULT), max_steps=int(steps), confirm=False)
+        if use_shared:
+            if _shared is None:
+                _shared = Planner(allowed_intents=set(SAFE_INTENTS_DEFAULT), confirm=False)
+            planner = _shared
+            planner.max_steps = int(steps)
+        else:
+            planner = Planner(allowed_intents=set(SAFE_INTENTS_DEFAULT), max_steps=int(steps), confirm=False)
         planner.run(goal)
         return 0
     except Exception as e:
         print(f"Planner error: {e}")
         return 1
-
+    finally:
+        if use_shared:
+            _shared_lock.release()
+        elif planner is not None:
+            planner.close()
@@ -1,7 +1,38 @@
+import os
 import subprocess
 
+def _proc_stats():
+    """Yield (pid, comm, %cpu, %mem) like `ps`, read straight from /proc."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    with open("/proc/uptime") as f:
+        uptime = float(f.read().split()[0])
+    with open("/proc/meminfo") as f:
+        mem_total = int(f.readline().split()[1]) * 1024
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as f:
+                raw = f.read()
+        except OSError:
+            continue  # process exited meanwhile
+        comm = raw[raw.index("(") + 1:raw.rindex(")")]
+        fields = raw[raw.rindex(")") + 2:].split()
+        cpu_time = (int(fields[11]) + int(fields[12])) / ticks
+        elapsed = uptime - int(fields[19]) / ticks
+        cpu = 100 * cpu_time / elapsed if elapsed > 0 else 0.0
+        mem = 100 * int(fields[21]) * page / mem_total
+        yield int(entry.name), comm, cpu, mem
+
 def top20():
-    subprocess.run("bash -lc 'ps -eo pid,comm,%cpu,%mem --sort=-%cpu | head -n 20'", shell=True)
+    if not os.path.isdir("/proc"):
+        return subprocess.run("bash -lc 'ps -eo pid,comm,%cpu,%mem --sort=-%cpu | head -n 20'", shell=True).returncode
+    rows = sorted(_proc_stats(), key=lambda r: r[2], reverse=True)[:19]
+    print(f"{'PID':>7} {'COMMAND':<15} {'%CPU':>5} {'%MEM':>5}")
+    for pid, comm, cpu, mem in rows:
+        print(f"{pid:>7} {comm[:15]:<15} {cpu:>5.1f} {mem:>5.1f}")
+    return 0
 
 def uptime():
     subprocess.run(["uptime","-p"])
@@ -1,4 +1,4 @@
-import os, json
+import os, json, queue
 import pyaudio
 from dotenv import load_dotenv
 from vosk import Model, KaldiRecognizer
@@ -18,13 +18,22 @@ def main():
     # rec = KaldiRecognizer(model, 16000, json.dumps(COMMANDS))
 
     rec = KaldiRecognizer(model, 16000)
+
+    # PortAudio's callback thread only enqueues frames; recognition runs here,
+    # so slow AcceptWaveform calls never cause capture overflows.
+    frames=queue.SimpleQueue()
+    def on_audio(in_data, frame_count, time_info, status):
+        frames.put(in_data)
+        return (None, pyaudio.paContinue)
+
     pa=pyaudio.PyAudio()
-    stream=pa.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=8000)
+    stream=pa.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True,
+                   frames_per_buffer=4000, stream_callback=on_audio)
     stream.start_stream()
     print('🎤 Speak… (e.g. "Create a folder Projects") — press Ctrl+C to stop')
     try:
         while True:
-            data=stream.read(4000, exception_on_overflow=False)
+            data=frames.get()
             if len(data)==0: continue
             if rec.AcceptWaveform(data):
                 j=json.loads(rec.Result())
@@ -33,6 +42,10 @@ def main():
                     print(f"You said: {text}")
     except KeyboardInterrupt:
         pass
+    finally:
+        stream.stop_stream()
+        stream.close()
+        pa.terminate()
 
 if __name__=='__main__':
     main()
\ No newline at end of file
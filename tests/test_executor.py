@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from ai_adapter.core import executor
+
+
+class FakeProc:
+    def __init__(self, code=0):
+        self.code = code
+
+    async def wait(self):
+        return self.code
+
+
+@pytest.fixture
+def spawned(monkeypatch):
+    """Record whether _spawn went through the shell or straight to exec."""
+    calls = []
+
+    async def fake_shell(cmd, **kwargs):
+        calls.append(("shell", cmd))
+        return FakeProc()
+
+    async def fake_exec(*args, **kwargs):
+        calls.append(("exec", args))
+        return FakeProc()
+
+    monkeypatch.setattr(asyncio, "create_subprocess_shell", fake_shell)
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+    monkeypatch.setenv("HOME", "/home/mia")
+    return calls
+
+
+def _route(cmd, calls):
+    calls.clear()
+    assert asyncio.run(executor._spawn(cmd)) == 0
+    return calls[0]
+
+
+@pytest.mark.parametrize("cmd", [
+    "cd /tmp",                      # builtin
+    "export X=1",                   # builtin
+    "FOO=1 env",                    # assignment prefix
+    "ls | wc -l",                   # metacharacters
+    "echo $HOME",
+    "ls *.py",
+    "echo hi!",
+    "echo hi # comment",
+    "echo 'unterminated",           # shlex cannot split it
+    "mia-no-such-command --flag",   # not on PATH
+    "echo '~'",                     # quoted ~ must stay literal
+    'ls "~/x"',
+])
+def test_spawn_uses_the_shell_when_needed(spawned, cmd):
+    assert _route(cmd, spawned) == ("shell", cmd)
+
+
+def test_spawn_execs_plain_commands(spawned):
+    assert _route("echo hello world", spawned) == ("exec", ("echo", "hello", "world"))
+
+
+def test_spawn_expands_unquoted_tilde(spawned):
+    assert _route("ls -lah ~", spawned) == ("exec", ("ls", "-lah", "/home/mia"))
+
+
+def test_parallel_intent_runs_only_confirmed_commands_together(monkeypatch):
+    started, release = [], asyncio.Event()
+
+    async def fake_spawn(cmd):
+        started.append(cmd)
+        if len(started) == 2:
+            release.set()
+        await release.wait()  # deadlocks unless both run concurrently
+        return {"a": 0, "b": 3}[cmd]
+
+    answers = iter(["y", "n", "y"])
+    monkeypatch.setattr(executor, "_spawn", fake_spawn)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    execu = executor.Executor(confirm=True)
+    code = asyncio.run(asyncio.wait_for(execu.run_async(["a", "skipped", "b"], parallel=True), 5))
+    assert sorted(started) == ["a", "b"]
+    assert code == 3
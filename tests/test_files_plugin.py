@@ -56,3 +56,126 @@ keyword
         # Only the standalone line was replaced
         assert "keyword = 42" in after
         assert after.count("keyword") == 1
+
+
+def test_edit_file_block_below_top_keeps_nested_indent():
+    original = """\
+def a():
+    pass
+
+def target():
+    return 1
+"""
+    replacement = """\
+def target():
+    return 2
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(original)
+
+        code = files.edit_file(path=path, new_content=replacement, keyword="target")
+        assert code == 0
+        after = _read(path)
+
+        assert after == "def a():\n    pass\n\ndef target():\n    return 2\n"
+        compile(after, path, "exec")
+
+
+def test_edit_file_method_in_class_is_reindented_to_its_level():
+    original = """\
+class Demo:
+    def before(self):
+        return 0
+
+    def target(self):
+        return 1
+"""
+    replacement = """\
+def target(self):
+    if True:
+        return 9
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(original)
+
+        code = files.edit_file(path=path, new_content=replacement, keyword="target")
+        assert code == 0
+        after = _read(path)
+
+        assert "    def target(self):\n        if True:\n            return 9\n" in after
+        assert "    def before(self):\n        return 0\n" in after
+        compile(after, path, "exec")
+
+
+def test_edit_file_block_match_wins_over_earlier_standalone_line():
+    original = """\
+target
+
+@dec
+def other():
+    pass
+
+def target():
+    return 1
+"""
+    replacement = """\
+def target():
+    return 2
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(original)
+
+        code = files.edit_file(path=path, new_content=replacement, keyword="target")
+        assert code == 0
+        after = _read(path)
+
+        # The standalone line is left alone once a block matches
+        assert after.startswith("target\n")
+        # Only the target block changed; the unrelated decorated function survives
+        assert "@dec\ndef other():\n    pass\n" in after
+        assert "return 2" in after and "return 1" not in after
+
+
+def test_edit_file_line_replacement_is_literal():
+    original = "keep\nvalue\n"
+    replacement = r"value = '\1\n'"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(original)
+
+        code = files.edit_file(path=path, new_content=replacement, keyword="value")
+        assert code == 0
+        assert _read(path) == "keep\nvalue = '\\1\\n'\n"
+
+
+def test_edit_file_whole_file_overwrite_still_writes_backup():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("old\n")
+
+        code = files.edit_file(path=path, new_content="new")
+        assert code == 0
+
+        assert _read(path) == "new\n"
+        assert _read(path + ".bak") == "old\n"
+
+
+def test_read_file_treats_missing_or_bad_max_bytes_as_default(capsys):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("hello\n")
+
+        for max_bytes in (None, "", 0, -5, "3"):
+            assert files.read_file(path, max_bytes=max_bytes) == 0
+            out = capsys.readouterr().out
+            assert out.startswith("hel")
+            assert ("hello" in out) == (max_bytes != "3")
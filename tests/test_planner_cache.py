@@ -0,0 +1,111 @@
+import copy
+
+import pytest
+
+from ai_adapter.cache import llm_disk
+from ai_adapter.planner import self_loop
+from ai_adapter.planner.self_loop import Planner
+
+
+class StubEngine:
+    """Deterministic engine that always gives the same reply and counts calls."""
+    temperature = 0
+    model = "m"
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def parse(self, prompt, system, on_token=None):
+        self.calls += 1
+        return copy.deepcopy(self.reply)
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    monkeypatch.setenv("MIA_NO_CACHE", "1")  # memory LRU only
+    Planner.clear_cache()
+    p = Planner()
+    yield p
+    p.close()
+    Planner.clear_cache()
+
+
+def _ask(planner, engine, prompt="PROMPT"):
+    return planner._loop.run_until_complete(planner._ask(engine, prompt))
+
+
+def test_cache_hit_returns_a_deep_copy(planner):
+    engine = StubEngine({"intent": "read_file", "params": {"path": "a.txt"}})
+    first = _ask(planner, engine)
+    first["params"]["path"] = "mutated"
+
+    second = _ask(planner, engine)
+    assert engine.calls == 1
+    assert second["params"]["path"] == "a.txt"
+
+
+def test_cache_entry_expires_after_ttl(planner, monkeypatch):
+    engine = StubEngine({"intent": "read_file", "params": {}})
+    _ask(planner, engine)
+    monkeypatch.setattr(self_loop, "RESP_CACHE_TTL", 0)
+    _ask(planner, engine)
+    assert engine.calls == 2
+
+
+def test_cache_is_trimmed_to_size(planner, monkeypatch):
+    monkeypatch.setattr(self_loop, "RESP_CACHE_SIZE", 2)
+    engine = StubEngine({"intent": "read_file", "params": {}})
+    for i in range(4):
+        _ask(planner, engine, f"PROMPT {i}")
+    assert len(Planner._resp_cache) == 2
+
+    _ask(planner, engine, "PROMPT 0")  # evicted, so the engine is asked again
+    assert engine.calls == 5
+
+
+@pytest.mark.parametrize("reply", [
+    {"stop": True, "report": "done"},
+    {"error": "model is loading"},
+    {"intent": "unknown", "params": {"raw": "not json"}},
+])
+def test_terminal_and_failed_replies_are_not_cached(planner, reply):
+    engine = StubEngine(reply)
+    _ask(planner, engine)
+    _ask(planner, engine)
+    assert engine.calls == 2
+    assert not Planner._resp_cache
+
+
+class FakeDiskCache(dict):
+    def set(self, key, value, expire=None):
+        self[key] = value
+
+
+def test_error_reply_reaches_neither_cache(planner, monkeypatch):
+    monkeypatch.delenv("MIA_NO_CACHE")
+    disk = FakeDiskCache()
+    monkeypatch.setattr(llm_disk, "_cache", disk)
+
+    engine = StubEngine({"error": "model is loading"})
+    _ask(planner, engine)
+    assert not Planner._resp_cache
+    assert not disk
+
+    # A good reply is written to disk and served from there after a restart
+    engine = StubEngine({"intent": "read_file", "params": {}})
+    _ask(planner, engine, "OTHER")
+    Planner.clear_cache()
+    assert _ask(planner, engine, "OTHER") == {"intent": "read_file", "params": {}}
+    assert engine.calls == 1
+
+
+def test_bad_disk_entry_is_not_replayed(planner, monkeypatch):
+    monkeypatch.delenv("MIA_NO_CACHE")
+    disk = FakeDiskCache()
+    monkeypatch.setattr(llm_disk, "_cache", disk)
+    disk[llm_disk.key_for("StubEngine:m\nPROMPT")] = {"error": "model is loading"}
+
+    engine = StubEngine({"intent": "read_file", "params": {}})
+    assert _ask(planner, engine)["intent"] == "read_file"
+    assert engine.calls == 1